@@ -47,7 +47,7 @@ templates_path = ["_templates"]
 exclude_patterns = [
     "Thumbs.db",
     ".DS_Store",
-    ".ipynb_checkpoints",
+    "**/.ipynb_checkpoints",
     "tutorials/einops-image.zarr",
     "**/*.py",
 ]
@@ -70,11 +70,13 @@ execution_excludepatterns = ["*.ipynb"]
 myst_enable_extensions = ["colon_fence", "deflist", "dollarmath", "amsmath"]
 
 autosummary_generate = True
+autosummary_generate_overwrite = False
 autodoc_typehints = "none"
 autodoc_default_options = {
     "members": False,
 }
 
+numpydoc_class_members_toctree = False
 numpydoc_xref_param_type = True
 numpydoc_xref_ignore = {"of", "or", "optional", "scalar"}
 singulars = ("int", "list", "dict", "float")
@@ -6,8 +6,8 @@ Stats, linear algebra and einops for xarray
 
 from __future__ import annotations
 
-from .linalg import einsum, raw_einsum, einsum_path, matmul
+from .linalg import einsum, raw_einsum, einsum_path, build_einsum_plan, matmul
 
-__all__ = ["einsum", "raw_einsum", "einsum_path", "matmul"]
+__all__ = ["einsum", "raw_einsum", "einsum_path", "build_einsum_plan", "matmul"]
 
 __version__ = "0.2.0.dev0"
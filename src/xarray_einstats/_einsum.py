@@ -0,0 +1,155 @@
+"""Einsum helpers used by :mod:`xarray_einstats.linalg`.
+
+Private module. The functions here only work with einsum subscripts, dimension sizes
+and numpy arrays, never with xarray objects.
+"""
+from collections import namedtuple
+from functools import lru_cache, partial
+
+import numpy as np
+
+
+def _precompute_einsum_path(subscripts, in_dims, sizes, optimize):
+    """Compute the contraction path once with zero-strided dummy arrays.
+
+    The path is computed a single time from placeholder arrays with the full shapes of
+    the inputs that :func:`xarray.apply_ufunc` will pass to :func:`numpy.einsum`,
+    and then reused for every block. Paths are cached on the subscripts,
+    the shapes of the inputs and ``optimize``.
+    """
+    core_dims = set().union(*in_dims)
+    batch_shape = tuple(size for dim, size in sizes.items() if dim not in core_dims)
+    shapes = []
+    for sub, sublist in zip(subscripts.split("->")[0].split(","), in_dims):
+        core_shape = tuple(sizes[dim] for dim in sublist)
+        shapes.append(batch_shape + core_shape if "..." in sub else core_shape)
+    return list(_cached_einsum_path(subscripts, tuple(shapes), optimize))
+
+
+@lru_cache(maxsize=128)
+def _cached_einsum_path(subscripts, shapes, optimize):
+    """Cache :func:`_precompute_einsum_path` results.
+
+    ``optimize`` already includes the memory limit if any. The path is returned
+    as a tuple so the cached value can't be modified, callers get a new list.
+    """
+    dummy = np.empty(())
+    dummies = [np.broadcast_to(dummy, shape) for shape in shapes]
+    return tuple(np.einsum_path(subscripts, *dummies, optimize=optimize)[0])
+
+
+def _parse_subscripts(subscripts):
+    """Split einsum subscripts into input terms and the output term.
+
+    In implicit mode, the output term is generated following the same rules as
+    :func:`numpy.einsum`.
+    """
+    in_subscript, arrow, out_subscript = subscripts.partition("->")
+    terms = in_subscript.split(",")
+    if not arrow:
+        letters = in_subscript.replace("...", "").replace(",", "")
+        out_subscript = "".join(
+            sorted(letter for letter in set(letters) if letters.count(letter) == 1)
+        )
+        if "..." in in_subscript:
+            out_subscript = "..." + out_subscript
+    return terms, out_subscript
+
+
+def _contraction_step(terms, needed, out_term=None):
+    """Get the function and output term for a single step of the contraction path.
+
+    If ``out_term`` is given and the step can't use :func:`numpy.tensordot`, it is used
+    as output term, otherwise the output term contains the letters in ``needed``
+    in order of appearance.
+    """
+    ellipsis = "..." if any(term.startswith("...") for term in terms) else ""
+    letters = [term.replace("...", "") for term in terms]
+    if len(terms) == 2 and not ellipsis and all(len(set(term)) == len(term) for term in letters):
+        left, right = letters
+        shared = [letter for letter in left if letter in right]
+        kept = [letter for letter in left + right if letter not in shared]
+        if not any(letter in needed for letter in shared) and all(
+            letter in needed for letter in kept
+        ):
+            axes = (
+                [left.index(letter) for letter in shared],
+                [right.index(letter) for letter in shared],
+            )
+            return partial(np.tensordot, axes=axes), "".join(kept)
+    if (
+        len(terms) == 2
+        and letters[0] == letters[1]
+        and len(set(letters[0])) == len(letters[0])
+        and all(letter in needed for letter in letters[0])
+    ):
+        return np.multiply, ellipsis + letters[0]
+    if out_term is None:
+        out_term = ellipsis + "".join(
+            letter for letter in dict.fromkeys("".join(letters)) if letter in needed
+        )
+    return partial(np.einsum, f"{','.join(terms)}->{out_term}"), out_term
+
+
+@lru_cache(maxsize=128)
+def _compile_einsum(subscripts, path):
+    """Build a function that replays the contraction ``path`` for ``subscripts``.
+
+    Indices present in a single operand and not in the output are summed before
+    any pairwise contraction. Pairwise contractions that don't involve batch
+    dimensions call :func:`numpy.tensordot` directly, elementwise products
+    call :func:`numpy.multiply` and all other steps use :func:`numpy.einsum`.
+    The parsing of the subscripts and the selection of the function to use
+    at each step happens only once, so calling the returned function has no
+    overhead other than the calls to numpy.
+
+    Parameters
+    ----------
+    subscripts : str
+    path : tuple of tuple of int
+        Contraction path as returned by :func:`numpy.einsum_path`
+        without the leading ``"einsum_path"``.
+    """
+    terms, out_term = _parse_subscripts(subscripts)
+    presums = []
+    if len(terms) > 1:
+        for i, term in enumerate(terms):
+            others = out_term + "".join(terms[:i] + terms[i + 1 :])
+            reduced = ("..." if term.startswith("...") else "") + "".join(
+                letter for letter in dict.fromkeys(term.replace("...", "")) if letter in others
+            )
+            if reduced != term:
+                presums.append((i, partial(np.einsum, f"{term}->{reduced}")))
+                terms[i] = reduced
+    steps = []
+    for contract_inds in path:
+        contract_inds = sorted(contract_inds, reverse=True)
+        step_terms = [terms.pop(i) for i in contract_inds]
+        func, result = _contraction_step(
+            step_terms, set(out_term + "".join(terms)), None if terms else out_term
+        )
+        terms.append(result)
+        steps.append((contract_inds, func))
+    if terms[0] != out_term:
+        if (
+            "." not in out_term
+            and set(out_term) == set(terms[0])
+            and len(out_term) == len(terms[0])
+        ):
+            axes = [terms[0].index(letter) for letter in out_term]
+            steps.append(([0], partial(np.transpose, axes=axes)))
+        else:
+            steps.append(([0], partial(np.einsum, f"{terms[0]}->{out_term}")))
+
+    def compiled_einsum(*arrays):
+        operands = list(arrays)
+        for i, func in presums:
+            operands[i] = func(operands[i])
+        for contract_inds, func in steps:
+            operands.append(func(*[operands.pop(i) for i in contract_inds]))
+        return operands[0]
+
+    return compiled_einsum
+
+
+EinsumPlan = namedtuple("EinsumPlan", ["subscripts", "in_dims", "out_dims", "path"])
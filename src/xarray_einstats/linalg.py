@@ -1,7 +1,23 @@
-"""Wrappers for :mod:`numpy.linalg`."""
+"""Wrappers for :mod:`numpy.linalg`.
+
+If `opt_einsum <https://optimized-einsum.readthedocs.io>`_ is installed,
+:func:`~xarray_einstats.einsum` and :func:`~xarray_einstats.raw_einsum` use
+:func:`opt_einsum.contract` instead of :func:`numpy.einsum`. It can be installed
+manually or as ``xarray-einstats[opt_einsum]``.
+"""
+from collections import Counter, defaultdict
+from functools import lru_cache, partial
+
 import numpy as np
 import xarray as xr
 
+try:
+    from opt_einsum import contract as _oe_contract
+except ImportError:
+    _oe_contract = None
+
+from ._einsum import EinsumPlan, _compile_einsum, _precompute_einsum_path
+
 __all__ = [
     "matrix_power",
     "matrix_transpose",
@@ -98,10 +114,21 @@ def get_default_dims(da1_dims, d2_dims=None):
     raise MissingMonkeypatchError()
 
 
+@lru_cache(maxsize=256)
+def _cached_default_dims(default_dims_func, da1_dims, da2_dims):
+    """Cache the output of ``default_dims_func`` for each combination of input dims.
+
+    ``default_dims_func`` is part of the key so that monkeypatching
+    :func:`get_default_dims` doesn't return outdated results.
+    """
+    dims = default_dims_func(da1_dims, da2_dims)
+    return dims if isinstance(dims, str) else tuple(dims)
+
+
 def _attempt_default_dims(func, da1_dims, da2_dims=None):
     """Raise a more informative warning."""
     try:
-        aux = get_default_dims(da1_dims, da2_dims)
+        aux = _cached_default_dims(get_default_dims, da1_dims, da2_dims)
     except MissingMonkeypatchError:
         raise TypeError(
             f"{func} missing required argument dims. You must monkeypatch "
@@ -110,41 +137,57 @@ def _attempt_default_dims(func, da1_dims, da2_dims=None):
     return aux
 
 
+_EINSUM_AXES = "zyxwvutsrqponmlkjihgfedcba"
+_EINSUM_AXES_SET = frozenset(_EINSUM_AXES)
+
+
 class PairHandler:
+    """Map dimension names to einsum subscripts.
+
+    Subscripts are handled as ASCII codes and built in a :class:`bytearray`
+    which is only decoded once per operand.
+    """
+
     def __init__(self, all_dims, keep_dims):
-        self.potential_out_dims = keep_dims.union(all_dims)
-        self.einsum_axes = list(
-            letter
-            for letter in "zyxwvutsrqponmlkjihgfedcba"
-            if letter not in self.potential_out_dims
-        )
+        self.potential_out_dims = keep_dims | all_dims if keep_dims else all_dims
+        if self.potential_out_dims.isdisjoint(_EINSUM_AXES_SET):
+            self.einsum_axes = bytearray(_EINSUM_AXES, "ascii")
+        else:
+            self.einsum_axes = bytearray(
+                "".join(letter for letter in _EINSUM_AXES if letter not in self.potential_out_dims),
+                "ascii",
+            )
         self.dim_map = {d: self.einsum_axes.pop() for d in all_dims}
         self.out_dims = []
-        self.out_subscript = ""
-
-    def process_dim_da_pair(self, da, dim_sublist):
-        da_dims = da.dims
-        out_dims = [
-            dim for dim in da_dims if dim in self.potential_out_dims and dim not in dim_sublist
-        ]
-        subscripts = ""
-        updated_in_dims = dim_sublist.copy()
-        for dim in out_dims:
-            self.out_dims.append(dim)
-            sub = self.einsum_axes.pop()
-            self.out_subscript += sub
-            subscripts += sub
-            updated_in_dims.insert(0, dim)
-        for dim in dim_sublist:
-            subscripts += self.dim_map[dim]
-        if len(da_dims) > len(out_dims) + len(dim_sublist):
-            return f"...{subscripts}", updated_in_dims
-        return subscripts, updated_in_dims
+        self.out_subscript = bytearray()
+
+    def process_dim_da_pair(self, da_dims, dim_sublist):
+        out_dims = []
+        ellipsis_dims = []
+        for dim in da_dims:
+            if dim in dim_sublist:
+                continue
+            if dim in self.potential_out_dims:
+                out_dims.append(dim)
+            else:
+                ellipsis_dims.append(dim)
+        subscripts = bytearray(self.einsum_axes.pop() for _ in out_dims)
+        self.out_dims.extend(out_dims)
+        self.out_subscript += subscripts
+        subscripts.extend(self.dim_map[dim] for dim in dim_sublist)
+        subscripts = subscripts.decode("ascii")
+        updated_in_dims = out_dims + list(dim_sublist)
+        if ellipsis_dims:
+            return f"...{subscripts}", updated_in_dims, ellipsis_dims
+        return subscripts, updated_in_dims, ellipsis_dims
+
+    def get_subscript(self, dims):
+        return bytes(self.dim_map[dim] for dim in dims).decode("ascii")
 
     def get_out_subscript(self):
         if not self.out_subscript:
             return ""
-        return f"->{self.out_subscript}"
+        return "->" + self.out_subscript.decode("ascii")
 
 
 def _einsum_parent(dims, *operands, keep_dims=frozenset()):
@@ -171,23 +214,38 @@ def _einsum_parent(dims, *operands, keep_dims=frozenset()):
     numpy.einsum, numpy.einsum_path
     xarray_einstats.einops.reduce
     """
-    if len(dims) == len(operands):
+    return _cached_einsum_parent(
+        tuple(tuple(sublist) for sublist in dims),
+        tuple(da.dims for da in operands),
+        frozenset(keep_dims),
+    )
+
+
+@lru_cache(maxsize=256)
+def _cached_einsum_parent(dims, operand_dims, keep_dims):
+    """Cache :func:`_einsum_parent` results, which only depend on dimension names.
+
+    All inputs must be hashable and so are the outputs, all lists are converted to tuples.
+    """
+    if len(dims) == len(operand_dims):
         in_dims = dims
         out_dims = None
-    elif len(dims) == len(operands) + 1:
+    elif len(dims) == len(operand_dims) + 1:
         in_dims = dims[:-1]
         out_dims = dims[-1]
     else:
         raise ValueError("length of dims and operands not compatible")
 
-    all_dims = set(dim for sublist in dims for dim in sublist)
+    all_dims = set().union(*dims)
     handler = PairHandler(all_dims, keep_dims)
     in_subscripts = []
     updated_in_dims = []
-    for da, sublist in zip(operands, in_dims):
-        in_subs, up_dims = handler.process_dim_da_pair(da, sublist)
+    ellipsis_dims = []
+    for da_dims, sublist in zip(operand_dims, in_dims):
+        in_subs, up_dims, ell_dims = handler.process_dim_da_pair(da_dims, sublist)
         in_subscripts.append(in_subs)
-        updated_in_dims.append(up_dims)
+        updated_in_dims.append(tuple(up_dims))
+        ellipsis_dims.append(tuple(ell_dims))
 
     in_subscript = ",".join(in_subscripts)
     if out_dims is None:
@@ -196,11 +254,76 @@ def _einsum_parent(dims, *operands, keep_dims=frozenset()):
     elif not out_dims:
         out_subscript = "->"
     else:
-        out_subscript = "->" + "".join(handler.dim_map[dim] for dim in out_dims)
+        out_subscript = "->" + handler.get_subscript(out_dims)
     if out_subscript and "..." in in_subscript:
         out_subscript = "->..." + out_subscript[2:]
     subscripts = in_subscript + out_subscript
-    return subscripts, updated_in_dims, out_dims
+    return subscripts, tuple(updated_in_dims), tuple(out_dims), tuple(ellipsis_dims)
+
+
+def build_einsum_plan(
+    dims, *operands, keep_dims=frozenset(), out_append="{i}", optimize="greedy", memory_limit=None
+):
+    """Preprocess the inputs of :func:`xarray_einstats.einsum` so they can be reused.
+
+    See :func:`xarray_einstats.einsum` for a detailed description of all arguments.
+    The plan can be reused in multiple :func:`~xarray_einstats.einsum` calls whose
+    operands have the same dimensions. ``subscripts``, ``in_dims`` and ``out_dims``
+    only depend on the dimension names, but ``path`` is optimized for the sizes
+    of ``operands``; it stays valid for other sizes but it may be suboptimal.
+
+    Parameters
+    ----------
+    dims : list of list of str
+    operands : DataArray
+    keep_dims : set, optional
+    out_append : str, optional
+    optimize : bool, str or list, optional
+        ``optimize`` argument for :func:`numpy.einsum_path`. If a string,
+        the contraction path is computed using the shapes of ``operands``.
+    memory_limit : int, optional
+
+    Returns
+    -------
+    EinsumPlan
+        Named tuple with the ``subscripts`` for :func:`numpy.einsum`, the core dimensions
+        of the inputs (``in_dims``) and output (``out_dims``) and the contraction ``path``.
+
+    Examples
+    --------
+    .. jupyter-execute::
+
+        from xarray_einstats import build_einsum_plan, einsum, tutorial
+        da = tutorial.generate_matrices_dataarray(5)
+        dims = [["dim", "dim2"], ["dim2", "batch"], ["dim", "batch"]]
+        plan = build_einsum_plan(dims, da, da)
+        einsum(dims, da, da, plan=plan)
+    """
+    subscripts, in_dims, out_dims, _ = _einsum_parent(dims, *operands, keep_dims=keep_dims)
+
+    totalcounts = Counter(out_dims)
+    counts = defaultdict(int)
+    updated_out_dims = []
+    for dim in out_dims:
+        counts[dim] += 1
+        count = counts[dim]
+        updated_out_dims.append(
+            dim + out_append.format(i=count) if (totalcounts[dim] > 1) and (count > 1) else dim
+        )
+
+    path = optimize
+    if optimize and not isinstance(optimize, list):
+        if optimize is True:
+            optimize = "greedy"
+        if memory_limit is not None:
+            optimize = (optimize, memory_limit)
+        if len(operands) <= 2:
+            # numpy.einsum_path always returns this path for one or two operands
+            path = ["einsum_path", tuple(range(len(operands)))]
+        else:
+            sizes = {dim: size for da in operands for dim, size in da.sizes.items()}
+            path = _precompute_einsum_path(subscripts, in_dims, sizes, optimize)
+    return EinsumPlan(subscripts, in_dims, tuple(updated_out_dims), path)
 
 
 def einsum_path(dims, *operands, keep_dims=frozenset(), optimize=None, **kwargs):
@@ -222,10 +345,8 @@ def einsum_path(dims, *operands, keep_dims=frozenset(), optimize=None, **kwargs)
     """
     op_kwargs = {} if optimize is None else dict(optimize=optimize)
 
-    subscripts, in_dims, _ = _einsum_parent(dims, *operands, keep_dims=keep_dims)
-    updated_in_dims = []
-    for sublist, da in zip(in_dims, operands):
-        updated_in_dims.append([dim for dim in da.dims if dim not in sublist] + sublist)
+    subscripts, in_dims, _, ellipsis_dims = _einsum_parent(dims, *operands, keep_dims=keep_dims)
+    updated_in_dims = [[*ell_dims, *sublist] for ell_dims, sublist in zip(ellipsis_dims, in_dims)]
 
     return xr.apply_ufunc(
         np.einsum_path,
@@ -238,7 +359,16 @@ def einsum_path(dims, *operands, keep_dims=frozenset(), optimize=None, **kwargs)
     ).values.item()
 
 
-def einsum(dims, *operands, keep_dims=frozenset(), out_append="{i}", einsum_kwargs=None, **kwargs):
+def einsum(
+    dims,
+    *operands,
+    keep_dims=frozenset(),
+    out_append="{i}",
+    einsum_kwargs=None,
+    memory_limit=None,
+    plan=None,
+    **kwargs,
+):
     """Preprocess inputs to call :func:`numpy.einsum` or :func:`numpy.einsum_path`.
 
     Usage examples of all arguments is available at the
@@ -267,7 +397,31 @@ def einsum(dims, *operands, keep_dims=frozenset(), out_append="{i}", einsum_kwar
         The first occurrence will keep the original name and not use ``out_append``.
         It will therefore inherit the coordinate values in case there were any.
     einsum_kwargs : dict, optional
-        Passed to :func:`numpy.einsum`
+        Passed to :func:`numpy.einsum`. Unless ``optimize`` is explicitly set in
+        ``einsum_kwargs``, ``optimize="greedy"`` is used so contractions can be
+        dispatched to :func:`numpy.tensordot`. Use ``einsum_kwargs={"optimize": False}``
+        to call :func:`numpy.einsum` without any path optimization.
+
+        The contraction path is computed only once, before calling :func:`xarray.apply_ufunc`,
+        and then reused for all blocks. An explicit path, like the ones returned
+        by :func:`xarray_einstats.einsum_path`, can also be used as ``optimize``.
+
+        If opt_einsum is installed, :func:`opt_einsum.contract` is used instead of
+        :func:`numpy.einsum` for contractions of three or more operands.
+        The ``backend`` key is passed to :func:`opt_einsum.contract`
+        except for ``backend="numpy-einsum"`` which forces using :func:`numpy.einsum`.
+        Backends other than ``"numpy"`` and ``"numpy-einsum"`` require opt_einsum.
+        Otherwise, if ``optimize`` is the only key, the contraction path is replayed
+        directly as a sequence of :func:`numpy.tensordot` and :func:`numpy.einsum` calls.
+        Contractions of two operands without batch dimensions
+        become a single :func:`numpy.tensordot` call followed by a transpose.
+    memory_limit : int, optional
+        Maximum number of elements allowed in intermediate arrays when computing
+        the contraction path.
+    plan : EinsumPlan, optional
+        Output of :func:`xarray_einstats.build_einsum_plan`. If provided, ``dims``,
+        ``keep_dims``, ``out_append``, ``memory_limit`` and ``optimize`` in ``einsum_kwargs``
+        are ignored and the preprocessing of the inputs is skipped.
     kwargs : dict, optional
         Passed to :func:`xarray.apply_ufunc`
 
@@ -277,31 +431,52 @@ def einsum(dims, *operands, keep_dims=frozenset(), out_append="{i}", einsum_kwar
     for that variable.
 
     """
-    if einsum_kwargs is None:
+    einsum_kwargs = {} if einsum_kwargs is None else dict(einsum_kwargs)
+    backend = einsum_kwargs.pop("backend", "numpy")
+    if _oe_contract is None and backend not in ("numpy", "numpy-einsum"):
+        raise ImportError(f"opt_einsum is required to use backend={backend!r}")
+
+    if plan is None:
+        plan = build_einsum_plan(
+            dims,
+            *operands,
+            keep_dims=keep_dims,
+            out_append=out_append,
+            optimize=einsum_kwargs.get("optimize", "greedy"),
+            memory_limit=memory_limit,
+        )
+    einsum_kwargs["optimize"] = plan.path
+    if backend == "numpy-einsum" or not plan.path:
+        einsum_func = partial(np.einsum, plan.subscripts)
+    elif _oe_contract is not None and (backend != "numpy" or len(plan.in_dims) > 2):
+        einsum_func = partial(_oe_contract, plan.subscripts, backend=backend)
+        if plan.path[0] == "einsum_path":
+            einsum_kwargs["optimize"] = plan.path[1:]
+    elif len(einsum_kwargs) == 1:
+        path = plan.path[1:] if plan.path[0] == "einsum_path" else plan.path
+        einsum_func = _compile_einsum(plan.subscripts, tuple(tuple(inds) for inds in path))
         einsum_kwargs = {}
+    else:
+        einsum_func = partial(np.einsum, plan.subscripts)
 
-    subscripts, updated_in_dims, out_dims = _einsum_parent(dims, *operands, keep_dims=keep_dims)
-
-    updated_out_dims = []
-    for i, dim in enumerate(out_dims):
-        totalcount = out_dims.count(dim)
-        count = out_dims[:i].count(dim) + 1
-        updated_out_dims.append(
-            dim + out_append.format(i=count) if (totalcount > 1) and (count > 1) else dim
-        )
     return xr.apply_ufunc(
-        np.einsum,
-        subscripts,
+        einsum_func,
         *operands,
-        input_core_dims=[[], *updated_in_dims],
-        output_core_dims=[updated_out_dims],
+        input_core_dims=plan.in_dims,
+        output_core_dims=[plan.out_dims],
         kwargs=einsum_kwargs,
         **kwargs,
     )
 
 
 def raw_einsum(
-    subscripts, *operands, keep_dims=frozenset(), out_append="{i}", einsum_kwargs=None, **kwargs
+    subscripts,
+    *operands,
+    keep_dims=frozenset(),
+    out_append="{i}",
+    einsum_kwargs=None,
+    memory_limit=None,
+    **kwargs,
 ):
     """Wrap :func:`numpy.einsum` crudely.
 
@@ -322,30 +497,22 @@ def raw_einsum(
     keep_dims : set, optional
     out_append : str, optional
     einsum_kwargs : dict, optional
+    memory_limit : int, optional
     kwargs : optional
     """
-    if "->" in subscripts:
-        in_subscripts, out_subscript = subscripts.split("->")
+    in_subscripts, arrow, out_subscript = subscripts.partition("->")
+    in_dims = [in_subscript.split() for in_subscript in in_subscripts.split(",")]
+    if arrow:
+        dims = [*in_dims, out_subscript.split()]
     else:
-        in_subscripts = subscripts
-        out_subscript = None
-    in_dims = [
-        [dim.strip(", ") for dim in in_subscript.split(" ")]
-        for in_subscript in in_subscripts.split(",")
-    ]
-    if out_subscript is None:
         dims = in_dims
-    elif not out_subscript:
-        dims = [*in_dims, []]
-    else:
-        out_dims = [dim.strip(", ") for dim in out_subscript.split(" ")]
-        dims = [*in_dims, out_dims]
     return einsum(
         dims,
         *operands,
         keep_dims=keep_dims,
         out_append=out_append,
         einsum_kwargs=einsum_kwargs,
+        memory_limit=memory_limit,
         **kwargs,
     )
 
@@ -358,6 +525,7 @@ def matmul(da, db, dims=None, out_append="2", **kwargs):
     """
     if dims is None:
         dims = _attempt_default_dims("matmul", da.dims, db.dims)
+    dims = tuple(dims)
     if len(dims) == 3:
         dim1, dim2, dim3 = dims
         dims1 = [dim1, dim2]
@@ -409,6 +577,7 @@ def matrix_transpose(da, dims):
     """
     if dims is None:
         dims = _attempt_default_dims("matrix_power", da.dims)
+    dims = tuple(dims)
     dim1, dim2 = dims
     return da.swap_dims({dim1: dim2, dim2: dim1}).transpose(..., *dims)
 
@@ -420,6 +589,7 @@ def matrix_power(da, n, dims=None, **kwargs):
     """
     if dims is None:
         dims = _attempt_default_dims("matrix_power", da.dims)
+    dims = tuple(dims)
     return xr.apply_ufunc(
         np.linalg.matrix_power, da, n, input_core_dims=[dims, []], output_core_dims=[dims], **kwargs
     )
@@ -432,6 +602,7 @@ def cholesky(da, dims=None, **kwargs):
     """
     if dims is None:
         dims = _attempt_default_dims("cholesky", da.dims)
+    dims = tuple(dims)
     return xr.apply_ufunc(
         np.linalg.cholesky, da, input_core_dims=[dims], output_core_dims=[dims], **kwargs
     )
@@ -444,6 +615,7 @@ def qr(da, dims=None, mode="reduced", out_append="2", **kwargs):  # pragma: no c
     """
     if dims is None:
         dims = _attempt_default_dims("qr", da.dims)
+    dims = tuple(dims)
     m_dim, n_dim = dims
     m, n = len(da[m_dim]), len(da[n_dim])
     k = min(m, n)
@@ -481,6 +653,7 @@ def svd(
     """
     if dims is None:
         dims = _attempt_default_dims("svd", da.dims)
+    dims = tuple(dims)
     m_dim, n_dim = dims
     m, n = len(da[m_dim]), len(da[n_dim])
     k, k_dim = (m, m_dim) if m >= n else (n, n_dim)
@@ -517,6 +690,7 @@ def eig(da, dims=None, **kwargs):
     """
     if dims is None:
         dims = _attempt_default_dims("eig", da.dims)
+    dims = tuple(dims)
     return xr.apply_ufunc(
         np.linalg.eig, da, input_core_dims=[dims], output_core_dims=[dims[-1:], dims], **kwargs
     )
@@ -529,6 +703,7 @@ def eigh(da, dims=None, UPLO="L", **kwargs):  # pylint: disable=invalid-name
     """
     if dims is None:
         dims = _attempt_default_dims("eigh", da.dims)
+    dims = tuple(dims)
     return xr.apply_ufunc(
         np.linalg.eigh,
         da,
@@ -546,6 +721,7 @@ def eigvals(da, dims=None, **kwargs):
     """
     if dims is None:
         dims = _attempt_default_dims("eigvals", da.dims)
+    dims = tuple(dims)
     return xr.apply_ufunc(
         np.linalg.eigvals, da, input_core_dims=[dims], output_core_dims=[dims[-1:]], **kwargs
     )
@@ -558,6 +734,7 @@ def eigvalsh(da, dims=None, UPLO="L", **kwargs):  # pylint: disable=invalid-name
     """
     if dims is None:
         dims = _attempt_default_dims("eigvalsh", da.dims)
+    dims = tuple(dims)
     return xr.apply_ufunc(
         np.linalg.eigvalsh,
         da,
@@ -577,10 +754,10 @@ def norm(da, dims=None, ord=None, **kwargs):  # pylint: disable=redefined-builti
         dims = _attempt_default_dims("norm", da.dims)
     norm_kwargs = {"ord": ord}
     if isinstance(dims, str):
-        in_dims = [dims]
+        in_dims = (dims,)
         norm_kwargs["axis"] = -1
     else:
-        in_dims = dims
+        in_dims = tuple(dims)
         norm_kwargs["axis"] = (-2, -1)
     return xr.apply_ufunc(
         np.linalg.norm, da, input_core_dims=[in_dims], kwargs=norm_kwargs, **kwargs
@@ -594,6 +771,7 @@ def cond(da, dims=None, p=None, **kwargs):  # pylint: disable=invalid-name
     """
     if dims is None:
         dims = _attempt_default_dims("cond", da.dims)
+    dims = tuple(dims)
     return xr.apply_ufunc(np.linalg.cond, da, input_core_dims=[dims], kwargs=dict(p=p), **kwargs)
 
 
@@ -604,6 +782,7 @@ def det(da, dims=None, **kwargs):
     """
     if dims is None:
         dims = _attempt_default_dims("det", da.dims)
+    dims = tuple(dims)
     return xr.apply_ufunc(np.linalg.det, da, input_core_dims=[dims], **kwargs)
 
 
@@ -614,6 +793,7 @@ def matrix_rank(da, dims=None, tol=None, hermitian=False, **kwargs):
     """
     if dims is None:
         dims = _attempt_default_dims("matrix_rank", da.dims)
+    dims = tuple(dims)
     return xr.apply_ufunc(
         np.linalg.matrix_rank,
         da,
@@ -630,6 +810,7 @@ def slogdet(da, dims=None, **kwargs):
     """
     if dims is None:
         dims = _attempt_default_dims("slogdet", da.dims)
+    dims = tuple(dims)
     return xr.apply_ufunc(
         np.linalg.slogdet, da, input_core_dims=[dims], output_core_dims=[[], []], **kwargs
     )
@@ -642,6 +823,7 @@ def trace(da, dims=None, offset=0, dtype=None, out=None, **kwargs):
     """
     if dims is None:
         dims = _attempt_default_dims("trace", da.dims)
+    dims = tuple(dims)
     trace_kwargs = dict(offset=offset, dtype=dtype, out=out, axis1=-2, axis2=-1)
     return xr.apply_ufunc(np.trace, da, input_core_dims=[dims], kwargs=trace_kwargs, **kwargs)
 
@@ -653,10 +835,11 @@ def solve(da, db, dims=None, **kwargs):
     """
     if dims is None:
         dims = _attempt_default_dims("solve", da.dims, db.dims)
+    dims = tuple(dims)
     if len(dims) == 3:
         b_dim = dims[0] if dims[0] in db.dims else dims[1]
-        in_dims = [dims[:2], [b_dim, dims[-1]]]
-        out_dims = [[b_dim, dims[-1]]]
+        in_dims = [dims[:2], (b_dim, dims[-1])]
+        out_dims = [(b_dim, dims[-1])]
     else:
         in_dims = [dims, dims[:1]]
         out_dims = [dims[:1]]
@@ -672,6 +855,7 @@ def inv(da, dims=None, **kwargs):
     """
     if dims is None:
         dims = _attempt_default_dims("inv", da.dims)
+    dims = tuple(dims)
     return xr.apply_ufunc(
         np.linalg.inv, da, input_core_dims=[dims], output_core_dims=[dims], **kwargs
     )
@@ -5,7 +5,15 @@ import pytest
 import xarray as xr
 from xarray.testing import assert_allclose, assert_equal
 
-from xarray_einstats import einsum, einsum_path, linalg, matmul, raw_einsum, tutorial
+from xarray_einstats import (
+    build_einsum_plan,
+    einsum,
+    einsum_path,
+    linalg,
+    matmul,
+    raw_einsum,
+    tutorial,
+)
 from xarray_einstats.linalg import (
     cholesky,
     cond,
@@ -75,6 +83,31 @@ def test_no_dims(matrices, monkeypatch):
     assert out.dims == matrices.dims
 
 
+def test_default_dims_cached(matrices, monkeypatch):
+    calls = []
+
+    def default_dims(dims1, dims2):  # pylint: disable=unused-argument
+        calls.append(dims1)
+        return ["dim", "dim2"]
+
+    monkeypatch.setattr(linalg, "get_default_dims", default_dims)
+
+    inv(matrices)
+    det(matrices)
+    assert len(calls) == 1
+
+
+def test_default_dims_str(matrices, monkeypatch):
+    def default_dims(dims1, dims2):  # pylint: disable=unused-argument
+        return "experiment"
+
+    monkeypatch.setattr(linalg, "get_default_dims", default_dims)
+
+    out = norm(matrices)
+    assert_dims_in_da(out, ("batch", "dim", "dim2"))
+    assert_dims_not_in_da(out, ["experiment"])
+
+
 class TestEinsumFamily:
     # raw_einsum calls einsum, so the tests on raw_einsum also cover einsum, then
     # there are some specific ones for various reasons,
@@ -92,6 +125,11 @@ class TestEinsumFamily:
         assert_dims_in_da(out, ["dim", "dim2"])
         assert_allclose(out, da.transpose(*out.dims))
 
+    def test_raw_einsum_whitespace(self, matrices):
+        out = raw_einsum(" batch,  experiment -> ", matrices, matrices)
+        expected = raw_einsum("batch,experiment->", matrices, matrices)
+        assert_allclose(out, expected)
+
     def test_raw_einsum_transpose(self, matrices):
         out = raw_einsum("batch experiment->experiment batch", matrices)
         assert out.ndim == matrices.ndim
@@ -112,10 +150,106 @@ class TestEinsumFamily:
         assert_dims_in_da(out, ["dim", "dim2", "ba tch", "exp,er->iment"])
         assert_allclose(out, da.transpose(*out.dims))
 
+    def test_einsum_no_optimize(self, matrices):
+        out = raw_einsum("dim dim2,dim2 batch->dim batch", matrices, matrices)
+        out_no_opt = raw_einsum(
+            "dim dim2,dim2 batch->dim batch",
+            matrices,
+            matrices,
+            einsum_kwargs={"optimize": False},
+        )
+        assert_allclose(out, out_no_opt)
+
+    def test_einsum_three_operands(self, matrices):
+        dims = [["dim", "dim2"], ["dim2", "batch"], ["batch", "experiment"], ["dim", "experiment"]]
+        out = einsum(dims, matrices, matrices, matrices)
+        out_no_opt = einsum(dims, matrices, matrices, matrices, einsum_kwargs={"optimize": False})
+        assert_allclose(out, out_no_opt)
+
+    @pytest.mark.parametrize("backend", ("numpy", "numpy-einsum"))
+    def test_einsum_backend(self, matrices, backend):
+        pytest.importorskip("opt_einsum")
+        dims = [["dim", "dim2"], ["dim2", "batch"], ["batch", "experiment"], ["dim", "experiment"]]
+        out = einsum(dims, matrices, matrices, matrices, einsum_kwargs={"backend": backend})
+        out_no_opt = einsum(dims, matrices, matrices, matrices, einsum_kwargs={"optimize": False})
+        assert_allclose(out, out_no_opt)
+
+    @pytest.mark.parametrize(
+        "dims",
+        (
+            [["dim", "dim2"], ["dim2", "batch"], ["batch", "experiment"], ["dim", "experiment"]],
+            [["dim2"], ["dim"], ["dim2", "dim"]],
+            [["dim2"], ["dim2"], []],
+            [["dim", "dim2"], ["dim2", "dim"], []],
+            [["dim", "dim2"], ["dim", "experiment"], ["dim"]],
+        ),
+    )
+    def test_einsum_compiled(self, matrices, monkeypatch, dims):
+        monkeypatch.setattr(linalg, "_oe_contract", None)
+        operands = [matrices] * (len(dims) - 1)
+        out = einsum(dims, *operands)
+        out_no_opt = einsum(dims, *operands, einsum_kwargs={"optimize": False})
+        assert_allclose(out, out_no_opt)
+
+    def test_einsum_tensordot(self, matrices):
+        da = matrices.isel(batch=0, experiment=0)
+        db = da.rename(dim2="dim3", dim="dim2")
+        out = einsum([["dim", "dim2"], ["dim2", "dim3"], ["dim3", "dim"]], da, db)
+        expected = xr.dot(da, db, dims="dim2")
+        assert list(out.dims) == ["dim3", "dim"]
+        assert_allclose(out, expected.transpose(*out.dims))
+
+    def test_einsum_backend_missing(self, matrices, monkeypatch):
+        monkeypatch.setattr(linalg, "_oe_contract", None)
+        with pytest.raises(ImportError, match="opt_einsum is required"):
+            einsum([["dim"], ["dim"]], matrices, matrices, einsum_kwargs={"backend": "torch"})
+
+    def test_einsum_memory_limit(self, matrices):
+        dims = [["dim", "dim2"], ["dim2", "batch"], ["batch", "experiment"], ["dim", "experiment"]]
+        out = einsum(dims, matrices, matrices, matrices, memory_limit=10)
+        out_no_opt = einsum(dims, matrices, matrices, matrices, einsum_kwargs={"optimize": False})
+        assert_allclose(out, out_no_opt)
+
+    def test_einsum_keep_dims_order(self, matrices):
+        vector = matrices.isel(batch=0, experiment=0, dim2=0)
+        out = einsum([["dim"], ["dim"]], matrices, vector, keep_dims={"batch", "experiment"})
+        expected = (matrices * vector).sum("dim")
+        assert_allclose(out, expected.transpose(*out.dims))
+
+    def test_einsum_plan(self, matrices):
+        dims = [["dim", "dim2"], ["dim2", "batch"], ["batch", "experiment"], ["dim", "experiment"]]
+        plan = build_einsum_plan(dims, matrices, matrices, matrices)
+        assert plan.out_dims == ("dim", "experiment")
+        out = einsum(dims, matrices, matrices, matrices, plan=plan)
+        assert_allclose(out, einsum(dims, matrices, matrices, matrices))
+        out = einsum(dims, 2 * matrices, matrices, matrices, plan=plan)
+        assert_allclose(out, einsum(dims, 2 * matrices, matrices, matrices))
+
+    def test_einsum_plan_path_cached(self, matrices, monkeypatch):
+        calls = []
+        einsum_path_orig = np.einsum_path
+
+        def einsum_path_count(*args, **kwargs):
+            calls.append(args[0])
+            return einsum_path_orig(*args, **kwargs)
+
+        monkeypatch.setattr(np, "einsum_path", einsum_path_count)
+        dims = [["dim", "dim2"], ["dim2", "batch"], ["batch", "experiment"], ["experiment", "dim"]]
+        plan = build_einsum_plan(dims, matrices, matrices, matrices)
+        plan.path.append((0, 1))
+        assert build_einsum_plan(dims, matrices, matrices, matrices).path == plan.path[:-1]
+        assert len(calls) == 1
+
     def test_einsum_path(self, matrices):
         out = einsum_path([["batch"], ["experiment"], []], matrices, matrices)
         assert out
 
+    def test_einsum_path_keep_dims(self, matrices):
+        out = einsum_path(
+            [["dim", "dim2"], ["dim2", "dim"], []], matrices, matrices, keep_dims={"batch"}
+        )
+        assert out[0][0] == "einsum_path"
+
 
 class TestWrappers:
     @pytest.mark.parametrize(